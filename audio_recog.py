@@ -1,7 +1,18 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import streamlit as st
+from streamlit_autorefresh import st_autorefresh
 import speech_recognition as sr
-import tempfile
-import os
+
+from audio_core import (
+    r,
+    calibrate_noise,
+    get_mic,
+    load_audio,
+    transcribe_audio,
+    start_streaming,
+    stop_streaming,
+)
 
 # Set page config
 st.set_page_config(
@@ -10,16 +21,9 @@ st.set_page_config(
     layout="wide"
 )
 
-# Initialize recognizer
-@st.cache_resource
-def get_recognizer():
-    return sr.Recognizer()
-
-r = get_recognizer()
-
 # App title
 st.title("🎤 Speech Recognition App")
-st.markdown("Upload audio files to convert speech to text")
+st.markdown("Upload audio files or record from your microphone to convert speech to text")
 
 # Language selection
 language = st.selectbox(
@@ -28,45 +32,131 @@ language = st.selectbox(
     index=0
 )
 
-# File uploader
-uploaded_file = st.file_uploader(
-    "Upload audio file (WAV, MP3, FLAC)",
-    type=['wav', 'mp3', 'flac']
-)
+# Sidebar controls
+with st.sidebar:
+    backend = st.selectbox("Engine", ["google", "vosk", "faster-whisper"])
+    if backend == "faster-whisper":
+        st.caption("Runs locally with int8 weights (uses AVX512-VNNI where available)")
+    if st.button("🔄 Recalibrate mic"):
+        st.session_state.pop('energy_threshold', None)
+
+col1, col2 = st.columns(2)
+
+with col1:
+    st.header("📁 Upload File")
 
-if uploaded_file is not None:
-    # Display audio
-    st.audio(uploaded_file)
-    
-    # Transcribe button
-    if st.button("🎵 Transcribe Audio", type="primary"):
-        with st.spinner("Processing..."):
+    # File uploader
+    uploaded_file = st.file_uploader(
+        "Upload audio file (WAV, MP3, M4A, FLAC, OGG)",
+        type=['wav', 'mp3', 'm4a', 'flac', 'ogg']
+    )
+
+    if uploaded_file is not None:
+        # Display audio
+        st.audio(uploaded_file)
+
+        # Decode once per new upload and keep the result across reruns -
+        # (name, size) is a cheap identity check for every interaction
+        fid = (uploaded_file.name, uploaded_file.size)
+        if st.session_state.get('fid') != fid:
+            st.session_state.fid = fid
+            st.session_state.trans_cache = {}
+            st.session_state.pop('audio', None)
+            st.session_state.pop('file_text', None)
+            # Drop any recognition still running for the previous file so
+            # its transcript can't land in the new file's cache
+            stale = st.session_state.pop('future', None)
+            if stale is not None:
+                stale.cancel()
+            st.session_state.pop('future_key', None)
             try:
-                # Save to temp file
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as tmp:
-                    tmp.write(uploaded_file.getvalue())
-                    tmp_path = tmp.name
-                
-                # Transcribe
-                with sr.AudioFile(tmp_path) as source:
-                    audio = r.record(source)
-                    text = r.recognize_google(audio, language=language)
-                
-                # Display result
-                st.success("✅ Transcription complete!")
-                st.text_area("Transcribed Text:", text, height=200)
-                
-                # Download button
-                st.download_button(
-                    label="📥 Download Text",
-                    data=text,
-                    file_name="transcription.txt",
-                    mime="text/plain"
+                st.session_state.audio = load_audio(uploaded_file)
+            except Exception as e:
+                # Corrupt or unparseable upload - report it instead of
+                # letting the decoder traceback onto the page
+                st.session_state.pop('fid', None)
+                st.error(f"Could not read audio file: {str(e)}")
+
+    if uploaded_file is not None and 'audio' in st.session_state:
+        pool = st.session_state.setdefault('pool', ThreadPoolExecutor(max_workers=1))
+
+        # Transcribe button - repeat clicks on the same file hit the
+        # session cache instead of re-running recognition
+        if st.button("🎵 Transcribe Audio", type="primary") and 'future' not in st.session_state:
+            key = (language, backend)
+            if key in st.session_state.trans_cache:
+                st.session_state.file_text = st.session_state.trans_cache[key]
+            else:
+                # Recognition runs off the script thread so the UI stays
+                # interactive; reruns below poll the future
+                st.session_state.future = pool.submit(
+                    transcribe_audio, st.session_state.audio, language, backend
                 )
-                
-                # Cleanup
-                os.unlink(tmp_path)
-                
+                st.session_state.future_key = key
+
+        if 'future' in st.session_state:
+            future = st.session_state.future
+            if future.done():
+                key = st.session_state.pop('future_key')
+                del st.session_state['future']
+                try:
+                    text = future.result()
+                    st.session_state.trans_cache[key] = text
+                    st.session_state.file_text = text
+                except sr.UnknownValueError:
+                    st.error("Could not understand audio. Try a clearer recording.")
+                except sr.RequestError as e:
+                    st.error(f"API Error: {e}")
+                except Exception as e:
+                    st.error(f"Error: {str(e)}")
+            else:
+                st_autorefresh(interval=250, key="transcribe_poll")
+                st.info("⏳ Processing...")
+                if st.button("✋ Cancel"):
+                    future.cancel()
+                    st.session_state.pop('future', None)
+                    st.session_state.pop('future_key', None)
+
+        if 'file_text' in st.session_state:
+            # Display result
+            st.success("✅ Transcription complete!")
+            st.text_area("Transcribed Text:", st.session_state.file_text, height=200)
+
+            # Download button
+            st.download_button(
+                label="📥 Download Text",
+                data=st.session_state.file_text,
+                file_name="transcription.txt",
+                mime="text/plain"
+            )
+
+# Only this subtree reruns on its button presses - the uploader column
+# and sidebar aren't re-executed per click
+@st.fragment
+def mic_panel(language, backend):
+    st.header("🎙️ Record")
+
+    if st.button("🎙️ Start Recording"):
+        with st.spinner("Listening..."):
+            try:
+                with get_mic() as source:
+                    if 'energy_threshold' in st.session_state:
+                        # Reuse the calibration from the first recording -
+                        # skips 500ms of blocking capture per click
+                        r.energy_threshold = st.session_state.energy_threshold
+                        r.dynamic_energy_threshold = False
+                    else:
+                        calibrate_noise(source, duration=0.5)
+                        st.session_state.energy_threshold = r.energy_threshold
+                    audio = r.listen(source, timeout=5)
+
+                text = transcribe_audio(audio, language, backend)
+
+                st.success("✅ Transcription complete!")
+                st.text_area("Transcribed Text:", text, height=200, key="mic_text")
+
+            except sr.WaitTimeoutError:
+                st.error("No speech detected. Try again.")
             except sr.UnknownValueError:
                 st.error("Could not understand audio. Try a clearer recording.")
             except sr.RequestError as e:
@@ -74,13 +164,44 @@ if uploaded_file is not None:
             except Exception as e:
                 st.error(f"Error: {str(e)}")
 
+    if 'stream' not in st.session_state:
+        if st.button("▶️ Start Live Transcription"):
+            try:
+                st.session_state.stream = start_streaming(language, backend)
+                st.session_state.pop('live_transcript', None)
+            except Exception as e:
+                st.error(f"Error: {str(e)}")
+    elif st.button("⏹️ Stop Live Transcription"):
+        stream = st.session_state.pop('stream')
+        stop_streaming(stream)
+        # Keep what was transcribed so stopping doesn't blank the panel
+        st.session_state.live_transcript = " ".join(stream['partials'])
+    if 'stream' in st.session_state:
+        st_autorefresh(interval=500, key="stream_refresh")
+        st.text_area(
+            "Live Transcript:",
+            " ".join(st.session_state.stream['partials']),
+            height=200,
+            key="live_text"
+        )
+    elif 'live_transcript' in st.session_state:
+        st.text_area(
+            "Live Transcript:",
+            st.session_state.live_transcript,
+            height=200,
+            key="live_text"
+        )
+
+with col2:
+    mic_panel(language, backend)
+
 # Instructions
 with st.expander("📖 How to Use"):
     st.markdown("""
-    1. Upload an audio file (WAV, MP3, or FLAC)
+    1. Upload an audio file (WAV, MP3, M4A, FLAC, or OGG) or use the microphone
     2. Select language
-    3. Click 'Transcribe Audio'
+    3. Click 'Transcribe Audio' or 'Start Recording'
     4. View and download the text
-    
+
     **Note:** Maximum file size is 50MB.
     """)